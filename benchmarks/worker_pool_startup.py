@@ -0,0 +1,86 @@
+"""
+Measures how long it takes to get workers ready to execute tasks on given environment and algorithm.
+
+Compares freshly spawned interpreters (each one importing everything and constructing environment on its own) with
+UniWorkerPool, both on the first start (forkserver has to be started and preload modules) and on the next one.
+
+Usage:
+
+    python benchmarks/worker_pool_startup.py -e my_project.environments.MyEnv -a my_project.algorithms.MyAlgo -n 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uni.pool import worker_runner  # noqa: E402
+from uni.runners import UniRunner  # noqa: E402
+
+# Barrier of all pool workers, see `_set_barrier`
+_barrier = None
+
+
+def _spawned_worker(environment, algorithm, ready):
+    runner = UniRunner(environment=environment, algorithm=algorithm, run_mode='worker', local=True)
+    runner.environment
+    ready.put(time.monotonic())
+
+
+def _set_barrier(barrier):
+    global _barrier
+    _barrier = barrier
+
+
+def _ready(_):
+    # Task returns only when every worker has been initialized, so none of them can pick up two tasks
+    _barrier.wait()
+    return worker_runner().worker_index
+
+
+def measure_spawn(environment, algorithm, processes):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    start = time.monotonic()
+    workers = [context.Process(target=_spawned_worker, args=(environment, algorithm, ready))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    latencies = [ready.get() - start for _ in workers]
+    for worker in workers:
+        worker.join()
+    return latencies
+
+
+def measure_pool(runner, processes):
+    barrier = multiprocessing.get_context('forkserver').Barrier(processes)
+    start = time.monotonic()
+    with runner.create_worker_pool(processes=processes, initializer=_set_barrier, initargs=(barrier,)) as pool:
+        ready = pool.map(_ready, range(processes), chunksize=1)
+        assert len(set(ready)) == processes, "every worker has to run exactly one task"
+        return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-e', '--environment', required=True, help='environment python path')
+    parser.add_argument('-a', '--algorithm', required=True, help='algorithm python path')
+    parser.add_argument('-n', '--processes', type=int, default=os.cpu_count(), help='number of workers')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of warm pool starts')
+    args = parser.parse_args()
+
+    runner = UniRunner(environment=args.environment, algorithm=args.algorithm, run_mode='worker', local=True)
+
+    latencies = measure_spawn(args.environment, args.algorithm, args.processes)
+    print('spawn:      all ready in %.3fs (mean per worker %.3fs)' % (
+        max(latencies), sum(latencies) / len(latencies)))
+
+    print('pool cold:  all ready in %.3fs' % measure_pool(runner, args.processes))
+    for _ in range(args.repeat):
+        print('pool warm:  all ready in %.3fs' % measure_pool(runner, args.processes))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,6 @@ setup(
     author='cypreess',
     author_email='cypreess@gmail.com',
     description='Uni SDK',
-    install_requires=[],
+    install_requires=['threadpoolctl'],
     scripts=[],
 )
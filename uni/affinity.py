@@ -0,0 +1,118 @@
+import fcntl
+import os
+import tempfile
+
+from uni.exceptions import UniConfigurationError
+
+# Environment variables read by OpenMP, BLAS implementations and numexpr when they create their thread pools
+THREAD_LIMIT_VARIABLES = (
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+
+# Lock files of cores reserved by this process with `acquire_cpu_slot`; kept open for the whole process life
+_cpu_locks = []
+
+
+def cpu_slot(value):
+    """Cleaner of CPU_SLOT parameter: empty means no pinning, `auto` means automatic allocation"""
+    if value is None or str(value).strip() == '':
+        return None
+    if str(value).strip().lower() == 'auto':
+        return 'auto'
+    return int(value)
+
+
+def available_cpus():
+    """Returns sorted list of cores that current process is allowed to run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def select_cpus(cpu_number, slot=0):
+    """
+    Selects `cpu_number` cores for the runner in given slot.
+
+    Runners packed on one node should use consecutive slots so each of them gets a disjoint core set.
+    """
+    cpus = available_cpus()
+    if cpu_number < 1:
+        raise UniConfigurationError('CPU_NUMBER must be at least 1')
+    if (slot + 1) * cpu_number > len(cpus):
+        raise UniConfigurationError('Cannot assign {number} cores for slot {slot}, only {available} available'.format(
+            number=cpu_number, slot=slot, available=len(cpus)))
+    return cpus[slot * cpu_number:(slot + 1) * cpu_number]
+
+
+def acquire_cpu_slot(cpu_number, lock_directory=None):
+    """
+    Allocates first free slot of `cpu_number` cores on this node.
+
+    Every core of the slot is reserved with an exclusive lock on a file in `lock_directory` (system temp directory
+    by default). Locks are released by the operating system when the process exits, so runners started
+    concurrently get disjoint cores even if they use different CPU_NUMBER.
+    """
+    lock_directory = lock_directory or tempfile.gettempdir()
+    cpus = available_cpus()
+    for slot in range(len(cpus) // max(cpu_number, 1)):
+        locks = []
+        for cpu in cpus[slot * cpu_number:(slot + 1) * cpu_number]:
+            lock_file = open(os.path.join(lock_directory, 'uni-cpu-%d.lock' % cpu), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                break
+            locks.append(lock_file)
+        else:
+            _cpu_locks.extend(locks)
+            return slot
+
+        for lock_file in locks:
+            lock_file.close()
+    raise UniConfigurationError('There is no free slot of {number} cores on this node'.format(number=cpu_number))
+
+
+def split_cpus(cpus, parts):
+    """Splits cores into `parts` disjoint sets; when there are fewer cores than parts, sets are reused"""
+    if parts <= len(cpus):
+        size, extra = divmod(len(cpus), parts)
+        sets, start = [], 0
+        for part in range(parts):
+            end = start + size + (1 if part < extra else 0)
+            sets.append(cpus[start:end])
+            start = end
+        return sets
+    return [[cpus[part % len(cpus)]] for part in range(parts)]
+
+
+def pin_process(cpus, pid=0):
+    """Pins process to given cores; returns False if platform does not support it"""
+    if not hasattr(os, 'sched_setaffinity'):
+        return False
+    os.sched_setaffinity(pid, cpus)
+    return True
+
+
+def limit_threads(threads, override=False):
+    """
+    Limits native thread pools to given number of threads.
+
+    Environment variables affect only libraries loaded afterwards, so this should be called before the algorithm
+    and environment modules are imported. Thread pools of already loaded libraries (e.g. numpy BLAS, imported by
+    the runner module itself) are limited with `threadpoolctl`. Explicitly exported variables are left untouched
+    unless `override` is set, e.g. for workers which inherited the limits of the whole runner.
+    """
+    import threadpoolctl
+
+    for variable in THREAD_LIMIT_VARIABLES:
+        if override:
+            os.environ[variable] = str(threads)
+        else:
+            os.environ.setdefault(variable, str(threads))
+
+    return threadpoolctl.threadpool_limits(limits=threads)
@@ -1,11 +1,16 @@
 import os
+import time
 from abc import ABCMeta, abstractmethod
 
 from uni.helpers import ParameterReaderMixin
+from uni.weights import UniWeightStore
 
 
 class UniAlgorithm(ParameterReaderMixin, metaclass=ABCMeta):
     NAME = None
+    # Set to True if `action` depends only on observation (not on episode, step nor any random state);
+    # it allows runner to cache actions in run mode
+    DETERMINISTIC = False
     PARAMETERS = {}
     PARAMETERS_CLEANERS = {}
 
@@ -14,6 +19,7 @@ class UniAlgorithm(ParameterReaderMixin, metaclass=ABCMeta):
         self.runner = runner
         self.observation_space = observation_space
         self.action_space = action_space
+        self.total_steps = 0  # number of environment steps performed during training
 
     @property
     def logger(self):
@@ -28,39 +34,94 @@ class UniAlgorithm(ParameterReaderMixin, metaclass=ABCMeta):
         train should be python generator. This generator steers the process of learning algorithm,
         yielding control to the runner whenever model should be evaluated for saving.
 
-        Runner is making decision about conditions under which model will be saved.
+        Runner is making decision about conditions under which model will be saved. By default control is yielded
+        after every episode; TRAIN_YIELD_EPISODES and TRAIN_YIELD_SECONDS allow to yield after a batch of episodes
+        instead, which lowers the framework overhead on cheap environments. The last episode is always yielded.
         """
-        episodes = self.runner['EPISODES']
+        episodes = int(self.runner['EPISODES'])
+        max_steps = self.runner['MAX_STEPS']
+        yield_episodes = self.runner['TRAIN_YIELD_EPISODES']
+        yield_seconds = self.runner['TRAIN_YIELD_SECONDS']
 
         # self.environment #.prepare()
         self.prepare()
 
+        environment = self.runner.environment
+        recorder = self.runner.trajectory_recorder
+        logger = self.logger
+
+        # Hooks which are not overridden are no-ops, so they are skipped altogether
+        pre_episode = self.pre_episode if self._overrides('pre_episode') else None
+        post_episode = self.post_episode if self._overrides('post_episode') else None
+        if recorder is None and not self._overrides('post_step'):
+            run_episode = self._run_bare_episode
+        else:
+            run_episode = self._run_episode
+
         episodes_rewards = []
+        last_yield_episode = 0
+        last_yield_time = time.monotonic()
 
-        for episode in range(1, int(episodes) + 1):
-            self.logger.info('Running episode #%d' % episode)
-            episodes_rewards.append(0.0)
-            observation = self.runner.environment.reset()
+        for episode in range(1, episodes + 1):
+            logger.info('Running episode #%d' % episode)
+            observation = environment.reset()
 
-            self.pre_episode(episode)
-            for step in range(1, self.runner['MAX_STEPS'] + 1):
-                action = self.action_train(episode, step, observation)
-                new_observation, reward, is_done, debug = self.runner.environment.step(action)
-                episodes_rewards[-1] += reward
-                self.post_step(episode, step, action, observation, new_observation, reward, is_done,
-                                         debug)
-                observation = new_observation
+            if pre_episode is not None:
+                pre_episode(episode)
 
-                if is_done:
-                    self.logger.info('Episode #%d is done' % episode)
-                    break
+            steps, episode_reward = run_episode(environment, recorder, episode, max_steps, observation)
+            episodes_rewards.append(episode_reward)
+            self.total_steps += steps
 
-            self.post_episode(episode)
+            if post_episode is not None:
+                post_episode(episode)
 
-            yield episodes_rewards
+            if episode - last_yield_episode >= yield_episodes or episode == episodes or (
+                    yield_seconds is not None and time.monotonic() - last_yield_time >= yield_seconds):
+                last_yield_episode = episode
+                last_yield_time = time.monotonic()
+                yield episodes_rewards
 
         self.logger.info("Training has finished successfully")
 
+    def _overrides(self, method_name):
+        return getattr(type(self), method_name) is not getattr(UniAlgorithm, method_name)
+
+    def _run_episode(self, environment, recorder, episode, max_steps, observation):
+        """Runs steps of single episode; returns number of steps and total reward"""
+        episode_reward = 0.0
+        step = 0
+        for step in range(1, max_steps + 1):
+            action = self.action_train(episode, step, observation)
+            new_observation, reward, is_done, debug = environment.step(action)
+            episode_reward += reward
+            if recorder is not None:
+                recorder.record(episode, observation, action, reward, is_done)
+            self.post_step(episode, step, action, observation, new_observation, reward, is_done, debug)
+            observation = new_observation
+
+            if is_done:
+                self.logger.info('Episode #%d is done' % episode)
+                break
+
+        return step, episode_reward
+
+    def _run_bare_episode(self, environment, recorder, episode, max_steps, observation):
+        """Same as `_run_episode` but without post_step hook and trajectory recording"""
+        action_train = self.action_train
+        environment_step = environment.step
+        episode_reward = 0.0
+        step = 0
+        for step in range(1, max_steps + 1):
+            observation, reward, is_done, debug = environment_step(action_train(episode, step, observation))
+            episode_reward += reward
+
+            if is_done:
+                self.logger.info('Episode #%d is done' % episode)
+                break
+
+        return step, episode_reward
+
     def prepare(self):
         """Set up some additional run-time properties for model"""
 
@@ -78,6 +139,10 @@ class UniAlgorithm(ParameterReaderMixin, metaclass=ABCMeta):
         """Perform action in environment based on observation in given episode step"""
         pass
 
+    def action_batch(self, episode, step, observations):
+        """Perform actions for a batch of observations, override it if model can evaluate them at once"""
+        return [self.action(episode, step, observation) for observation in observations]
+
     def action_train(self, episode, step, observation):
         """Specific version of action method that is used for training, by default is same as main action method"""
         return self.action(episode, step, observation)
@@ -90,6 +155,13 @@ class UniAlgorithm(ParameterReaderMixin, metaclass=ABCMeta):
         """Method runs on the end of each episode after all steps had been performed"""
         pass
 
+    def weight_store(self, directory, name='weights'):
+        """
+        Returns weight store which `save` and `load` can use to keep model arrays in a single memory mappable file,
+        e.g. `self.weight_store(directory).save({'w': self.w})` and `self.weight_store(directory).load()['w']`
+        """
+        return UniWeightStore(directory, name)
+
     @abstractmethod
     def save(self, directory):
         """Should dump the model to any number of files to provided directory"""
@@ -0,0 +1,152 @@
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from uni.helpers import import_path
+from uni.pool import worker_runner
+
+# Environment instances created by current pool worker, reused between trials
+_worker_environments = []
+
+# Barrier shared by all workers of the pool, see `_initialize_trials`
+_trial_barrier = None
+
+
+def _initialize_trials(barrier):
+    global _trial_barrier
+    _trial_barrier = barrier
+
+
+def _environments(runner, number):
+    while len(_worker_environments) < number:
+        if not _worker_environments:
+            _worker_environments.append(runner.environment)
+        else:
+            _worker_environments.append(import_path(runner.environment_path)(runner=runner))
+    return _worker_environments[:number]
+
+
+def measure_trial(trial):
+    """
+    Pool task stepping `environments` instances in lockstep, asking algorithm for actions in batches of `batch_size`
+    observations. First `warmup_steps` environment steps are not measured, then `steps` environment steps are.
+    Measured phase starts only when every worker of the pool has finished its warmup, so each worker runs exactly
+    one trial and all of them run in parallel.
+
+    Returns number of measured steps, monotonic start and end time of the measured phase and latency of every
+    measured step, i.e. time of computing its action batch plus time of the environment step itself.
+    """
+    environments_number, batch_size, steps, warmup_steps = trial
+    runner = worker_runner()
+    algorithm = runner.algorithm
+    environments = _environments(runner, environments_number)
+    observations = [environment.reset() for environment in environments]
+
+    latencies = []
+    performed = 0
+    start = None
+    step = 0
+    while start is None or performed < steps:
+        if start is None and performed >= warmup_steps:
+            _trial_barrier.wait()
+            start = time.monotonic()
+            performed = 0
+            latencies = []
+        step += 1
+
+        for first in range(0, environments_number, batch_size):
+            action_start = time.monotonic()
+            actions = algorithm.action_batch(1, step, observations[first:first + batch_size])
+            action_time = time.monotonic() - action_start
+
+            for number, action in enumerate(actions, first):
+                step_start = time.monotonic()
+                observation, reward, is_done, debug = environments[number].step(action)
+                latencies.append(action_time + time.monotonic() - step_start)
+                observations[number] = environments[number].reset() if is_done else observation
+            performed += len(actions)
+
+    return performed, start, time.monotonic(), latencies
+
+
+class UniAutotuner:
+    """
+    Finds number of worker processes giving the highest environment throughput.
+
+    Short trials are run for every combination of number of worker processes (powers of two up to CPU_NUMBER),
+    number of environment instances per worker and action batch size, and all of them are reported. Later runs use
+    a single environment per worker without batching, so WORKERS_NUMBER of the best such trial is written as
+    parameters file that can be passed to those runs with `--parameters-file`. The other combinations show how much
+    an algorithm could gain from overriding `action_batch`.
+    """
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.results = []
+
+    def workers_grid(self):
+        cpu_number = len(self.runner.cpus) if self.runner.cpus else self.runner['CPU_NUMBER']
+        workers = [2 ** power for power in range(int(np.log2(cpu_number)) + 1)]
+        if workers[-1] != cpu_number:
+            workers.append(cpu_number)
+        return workers
+
+    def run(self):
+        # Single environment without batching is always measured, as this is the setting which is written down
+        environments_grid = sorted(set([1] + self.runner['AUTOTUNE_ENVIRONMENTS']))
+        batch_sizes = sorted(set([1] + self.runner['AUTOTUNE_BATCH_SIZES']))
+        steps = self.runner['AUTOTUNE_TRIAL_STEPS']
+        warmup_steps = self.runner['AUTOTUNE_WARMUP_STEPS']
+
+        for workers in self.workers_grid():
+            barrier = multiprocessing.get_context('forkserver').Barrier(workers)
+            with self.runner.create_worker_pool(processes=workers, construct_algorithm=True,
+                                                initializer=_initialize_trials, initargs=(barrier,)) as pool:
+                for environments, batch_size in itertools.product(environments_grid, batch_sizes):
+                    if batch_size > environments:
+                        continue
+
+                    trials = pool.map(measure_trial, [(environments, batch_size, steps, warmup_steps)] * workers,
+                                      chunksize=1)
+
+                    # Monotonic clock is shared by processes, so measured phases of all trials can be put together
+                    measured_time = max(end for _, _, end, _ in trials) - min(start for _, start, _, _ in trials)
+                    latencies = np.concatenate([trial_latencies for _, _, _, trial_latencies in trials])
+
+                    result = {
+                        'WORKERS_NUMBER': workers,
+                        'environments_per_worker': environments,
+                        'action_batch_size': batch_size,
+                        'steps_per_sec': sum(performed for performed, _, _, _ in trials) / measured_time,
+                        'step_latency_ms': 1000 * float(latencies.mean()),
+                        'step_latency_p95_ms': 1000 * float(np.percentile(latencies, 95)),
+                    }
+                    self.results.append(result)
+                    self.runner.logger.info(
+                        'workers={WORKERS_NUMBER} environments={environments_per_worker} batch={action_batch_size}: '
+                        '{steps_per_sec:.1f} steps/s, step latency {step_latency_ms:.3f}ms '
+                        '(p95 {step_latency_p95_ms:.3f}ms)'.format(**result))
+
+        return self.best
+
+    @property
+    def best(self):
+        """Best trial among those using single environment per worker without batching"""
+        results = [result for result in self.results
+                   if result['environments_per_worker'] == 1 and result['action_batch_size'] == 1]
+        if not results:
+            return None
+        return max(results, key=lambda result: result['steps_per_sec'])
+
+    def write(self, path):
+        """Writes best setting as parameters file"""
+        parameters = {'WORKERS_NUMBER': self.best['WORKERS_NUMBER']}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(parameters, f, indent=2)
+        return parameters
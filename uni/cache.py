@@ -0,0 +1,65 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+def observation_key(observation):
+    """
+    Returns hashable key of observation or None if observation cannot be used as a key.
+
+    Arrays are keyed on a 16 byte digest of their data, so cache size does not depend on observation size.
+    """
+    if isinstance(observation, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(observation).data, digest_size=16).digest()
+        return observation.dtype.str, observation.shape, digest
+    if isinstance(observation, list):
+        observation = tuple(observation)
+    try:
+        hash(observation)
+    except TypeError:
+        return None
+    return observation
+
+
+class UniActionCache:
+    """
+    Bounded LRU cache of actions keyed on observation.
+
+    It is valid only for deterministic policies, i.e. when action depends on nothing but the observation
+    (see `UniAlgorithm.DETERMINISTIC`). Algorithm's `action` is called only on cache misses.
+    """
+
+    def __init__(self, size):
+        assert size > 0, "size must be positive"
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._actions = OrderedDict()
+
+    def action(self, algorithm, episode, step, observation):
+        key = observation_key(observation)
+        if key is None:
+            self.misses += 1
+            return algorithm.action(episode, step, observation)
+
+        try:
+            action = self._actions[key]
+        except KeyError:
+            self.misses += 1
+            action = self._actions[key] = algorithm.action(episode, step, observation)
+            if len(self._actions) > self.size:
+                self._actions.popitem(last=False)
+        else:
+            self.hits += 1
+            self._actions.move_to_end(key)
+
+        return action
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._actions)
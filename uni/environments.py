@@ -36,6 +36,32 @@ class UniEnvironment(ParameterReaderMixin, metaclass=ABCMeta):
     def render(self, *args, **kwargs):
         pass
 
+    @property
+    def frames_per_second(self):
+        """Frame rate of the video stream in run mode or None if environment is not streamed"""
+        return None
+
+    def pace_frames(self, pacer):
+        """
+        Asks environment to wait for `pacer` right before emitting each video frame and to skip late frames.
+
+        Returns False if the environment does not stream video, in which case the caller has to pace it.
+        """
+        return False
+
+    def stream_tiles(self, environments, grid=None, downscale=1):
+        """
+        Asks environment to stream frames of given other environments together with its own as a mosaic.
+
+        Returns False if the environment is not streamed or does not support tiling, in which case the other
+        environments are not used at all.
+        """
+        return False
+
+    def disable_stream(self):
+        """Asks environment not to stream its own video, e.g. because it is shown as a tile of other stream"""
+        pass
+
 
 class OpenAiGymUniEnvironment(UniEnvironment):
     OPEN_AI_GYM_ENV_NAME = None
@@ -45,6 +71,7 @@ class OpenAiGymUniEnvironment(UniEnvironment):
 
     def __init__(self, runner):
         self._env = None
+        self._streamed = True
         super().__init__(runner)
 
     def _create_gym_env(self, name):
@@ -62,7 +89,7 @@ class OpenAiGymUniEnvironment(UniEnvironment):
 
             self.pre_init_hook()
             self._env = self._create_gym_env(self.OPEN_AI_GYM_ENV_NAME)
-            if self.runner.run_mode == 'run' and not self.runner.render:
+            if self.runner.run_mode == 'run' and not self.runner.render and self._streamed:
                 # We only run rendering to video in "run" mode (not training mode)
                 self._env = monitor.UniMonitor(self._env)
 
@@ -84,3 +111,30 @@ class OpenAiGymUniEnvironment(UniEnvironment):
 
     def render(self, *args, **kwargs):
         return self.env.render(*args, **kwargs)
+
+    @property
+    def frames_per_second(self):
+        if isinstance(self.env, monitor.UniMonitor):
+            return self.env.frames_per_sec
+        return None
+
+    def pace_frames(self, pacer):
+        if not isinstance(self.env, monitor.UniMonitor):
+            return False
+        self.env.pace_with(pacer)
+        return True
+
+    def stream_tiles(self, environments, grid=None, downscale=1):
+        if not isinstance(self.env, monitor.UniMonitor):
+            return False
+        if not all(isinstance(environment, OpenAiGymUniEnvironment) for environment in environments):
+            return False
+
+        for environment in environments:
+            environment.disable_stream()
+        self.env.tile_with([environment.env for environment in environments], grid=grid, downscale=downscale)
+        return True
+
+    def disable_stream(self):
+        assert self._env is None, "disable_stream() must be called before the environment is created"
+        self._streamed = False
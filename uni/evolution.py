@@ -0,0 +1,194 @@
+from abc import abstractmethod
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from uni.algorithms import UniAlgorithm
+from uni.exceptions import UniConfigurationError
+from uni.pool import worker_runner
+
+# Shared arrays attached by current pool worker, by shared memory name
+_worker_shared_arrays = {}
+
+
+class UniSharedArray:
+    """Numpy array living in named shared memory, so other processes can attach to it without copying"""
+
+    def __init__(self, memory, shape, dtype):
+        self.memory = memory
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=memory.buf)
+
+    @classmethod
+    def create(cls, shape, dtype=np.float32):
+        size = max(int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize, 1)
+        return cls(shared_memory.SharedMemory(create=True, size=size), shape, dtype)
+
+    @classmethod
+    def attach(cls, name, shape, dtype=np.float32):
+        return cls(shared_memory.SharedMemory(name=name), shape, dtype)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def close(self):
+        # Array has to be released before the buffer it points to
+        self.array = None
+        self.memory.close()
+
+    def unlink(self):
+        self.close()
+        self.memory.unlink()
+
+
+def create_noise_table(size, seed):
+    """Creates shared table of standard normal noise; generated in chunks to avoid temporary float64 copy"""
+    table = UniSharedArray.create((size,), np.float32)
+    random_state = np.random.RandomState(seed)
+    chunk = 1000000
+    for start in range(0, size, chunk):
+        stop = min(start + chunk, size)
+        table.array[start:stop] = random_state.standard_normal(stop - start)
+    return table
+
+
+def _shared_array(name, shape):
+    if name not in _worker_shared_arrays:
+        _worker_shared_arrays[name] = UniSharedArray.attach(name, shape, np.float32)
+    return _worker_shared_arrays[name].array
+
+
+def centered_ranks(values):
+    """Maps values to their ranks scaled into [-0.5, 0.5], which makes update invariant to reward scale"""
+    ranks = np.empty(values.size, dtype=np.float32)
+    ranks[values.ravel().argsort()] = np.arange(values.size, dtype=np.float32)
+    ranks = ranks.reshape(values.shape)
+    return ranks / max(values.size - 1, 1) - 0.5
+
+
+def evaluate_perturbation(task):
+    """
+    Pool task evaluating policy perturbed by noise at given offset in both directions (mirrored sampling).
+
+    Only names of shared memory, offset and scalars are passed in and out; parameters and noise are read from
+    shared memory. Returns offset, positive and negative direction returns and number of steps performed.
+    """
+    noise_name, noise_size, parameters_name, dimension, offset, sigma = task
+    runner = worker_runner()
+    algorithm = runner.algorithm
+
+    noise = _shared_array(noise_name, (noise_size,))
+    parameters = _shared_array(parameters_name, (dimension,))
+    epsilon = sigma * noise[offset:offset + dimension]
+
+    returns = []
+    steps = 0
+    for perturbed in (parameters + epsilon, parameters - epsilon):
+        algorithm.set_parameters(perturbed)
+        episode_reward, episode_steps = algorithm.run_episode(runner.environment, runner['MAX_STEPS'])
+        returns.append(episode_reward)
+        steps += episode_steps
+
+    return offset, returns[0], returns[1], steps
+
+
+class UniEvolutionStrategiesAlgorithm(UniAlgorithm):
+    """
+    Base for gradient free algorithms trained with evolution strategies.
+
+    Every generation ES_POPULATION pairs of mirrored perturbations of the parameters are evaluated on the pool
+    workers, each on its own environment instance. Workers share one large noise table and the current parameters
+    through shared memory, so only noise offsets and returns are exchanged between processes. Main process ranks
+    the returns and performs a vectorized update. Returns of every evaluated episode are yielded to the runner so
+    the usual model saving logic applies; training lasts EPISODES episodes.
+
+    Subclasses need to implement `get_parameters`, `set_parameters` and `action`. Model is saved as single
+    parameters vector in the weight store.
+    """
+
+    @abstractmethod
+    def get_parameters(self):
+        """Returns flat vector of policy parameters"""
+        pass
+
+    @abstractmethod
+    def set_parameters(self, parameters):
+        """Sets policy parameters from flat vector"""
+        pass
+
+    def run_episode(self, environment, max_steps, episode=1):
+        """Runs single episode with current parameters; returns total reward and number of steps"""
+        observation = environment.reset()
+        episode_reward = 0.0
+        step = 0
+        for step in range(1, max_steps + 1):
+            observation, reward, is_done, debug = environment.step(self.action(episode, step, observation))
+            episode_reward += reward
+            if is_done:
+                break
+        return episode_reward, step
+
+    def train(self):
+        episodes = int(self.runner['EPISODES'])
+        population = self.runner['ES_POPULATION']
+        sigma = self.runner['ES_SIGMA']
+        learning_rate = self.runner['ES_LEARNING_RATE']
+        l2_coefficient = self.runner['ES_L2_COEFFICIENT']
+        noise_size = self.runner['ES_NOISE_SIZE']
+
+        self.prepare()
+
+        theta = np.array(self.get_parameters(), dtype=np.float32).ravel()
+        dimension = theta.size
+        if dimension > noise_size:
+            raise UniConfigurationError('ES_NOISE_SIZE ({size}) must not be smaller than number of parameters '
+                                        '({dimension})'.format(size=noise_size, dimension=dimension))
+
+        random_state = np.random.RandomState(self.runner['ES_SEED'])
+        noise = create_noise_table(noise_size, self.runner['ES_SEED'])
+        parameters = UniSharedArray.create((dimension,), np.float32)
+        # Every possible slice of noise table as (offsets, dimension) view, without copying
+        noise_windows = np.lib.stride_tricks.sliding_window_view(noise.array, dimension)
+
+        episodes_rewards = []
+        generation = 0
+
+        try:
+            with self.runner.create_worker_pool(construct_algorithm=True) as pool:
+                while len(episodes_rewards) < episodes:
+                    generation += 1
+                    parameters.array[:] = theta
+
+                    pairs = min(population, -(-(episodes - len(episodes_rewards)) // 2))
+                    offsets = random_state.randint(0, noise_size - dimension + 1, size=pairs)
+                    results = pool.map(evaluate_perturbation, [
+                        (noise.name, noise_size, parameters.name, dimension, int(offset), sigma) for offset in offsets])
+
+                    returns = np.array([(positive, negative) for _, positive, negative, _ in results],
+                                       dtype=np.float32)
+                    ranks = centered_ranks(returns)
+                    gradient = (ranks[:, 0] - ranks[:, 1]) @ noise_windows[offsets] / (2 * pairs * sigma)
+                    theta += learning_rate * (gradient - l2_coefficient * theta)
+                    self.set_parameters(theta.copy())
+
+                    self.total_steps += sum(steps for _, _, _, steps in results)
+                    episodes_rewards.extend(returns.ravel().tolist())
+
+                    self.logger.info('Generation #{generation}: mean return {mean:.3f}, max return {max:.3f}'.format(
+                        generation=generation, mean=float(returns.mean()), max=float(returns.max())))
+
+                    yield episodes_rewards
+        finally:
+            noise_windows = None
+            noise.unlink()
+            parameters.unlink()
+
+        self.logger.info("Training has finished successfully")
+
+    def save(self, directory):
+        self.weight_store(directory).save({'parameters': np.asarray(self.get_parameters(), dtype=np.float32)})
+
+    def load(self, directory):
+        self.set_parameters(np.array(self.weight_store(directory).load()['parameters']))
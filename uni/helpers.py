@@ -31,6 +31,28 @@ def parse_boolean(value):
     return value
 
 
+def str_list(value):
+    """Parses comma separated values, e.g. `a,b, c`"""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+def int_list(value):
+    """Parses comma separated integers, e.g. `1,2,4`"""
+    return [int(item) for item in str_list(value)]
+
+
+def parse_grid(value):
+    """Parses grid layout given as `ROWSxCOLUMNS`, e.g. `2x3`; empty value means automatic layout"""
+    if not value:
+        return None
+    if isinstance(value, (list, tuple)):
+        return tuple(int(item) for item in value)
+    rows, columns = str(value).lower().split('x')
+    return int(rows), int(columns)
+
+
 def type_or_none(t):
     def _(value):
         if not value:
@@ -40,6 +62,15 @@ def type_or_none(t):
     return _
 
 
+def read_parameters_file(parameters_file):
+    """Reads parameters from JSON file"""
+    try:
+        with open(parameters_file) as f:
+            return json.load(f)
+    except json.decoder.JSONDecodeError as e:
+        raise UniFatalError("Cannot parse parameters file (%s): %s" % (parameters_file, e))
+
+
 class ParameterReaderMixin:
     def read_parameters(self):
         """
@@ -48,9 +79,5 @@ class ParameterReaderMixin:
         base_dir = os.path.dirname(inspect.getfile(self.__class__))
         parameters_file = os.path.join(base_dir, 'parameters.json')
         if Path(parameters_file).is_file():
-            try:
-                with open(parameters_file) as f:
-                    return json.load(f)
-            except json.decoder.JSONDecodeError as e:
-                raise UniFatalError("Cannot parse parameters file (%s): %s" % (parameters_file, e))
+            return read_parameters_file(parameters_file)
         return {}
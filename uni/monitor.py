@@ -18,6 +18,10 @@ class UniMonitor(Wrapper):
         self.enabled = True
         self.episode_id = 0
         self._monitor_id = None
+        self._pacer = None
+        self._tiled_envs = []
+        self._tile_grid = None
+        self._tile_downscale = 1
 
     def _reset_video_recorder(self):
         # Close any existing video recorder
@@ -25,12 +29,31 @@ class UniMonitor(Wrapper):
             return
 
         # Start recording the next video.
-        self.video_recorder = UniStreamRecorder(
-            env=self.env,
-            enabled=self._video_enabled(),
-        )
+        if self._tiled_envs:
+            self.video_recorder = UniTiledStreamRecorder(
+                envs=[self.env] + self._tiled_envs,
+                grid=self._tile_grid,
+                downscale=self._tile_downscale,
+                enabled=self._video_enabled(),
+            )
+        else:
+            self.video_recorder = UniStreamRecorder(
+                env=self.env,
+                enabled=self._video_enabled(),
+            )
         self.video_recorder.capture_frame()
 
+    def tile_with(self, envs, grid=None, downscale=1):
+        """
+        Streams frames of this and given environments as one mosaic, see `UniTiledStreamRecorder`.
+
+        It has to be called before the first reset, when the video recorder is created.
+        """
+        assert self.video_recorder is None, "tile_with() must be called before the stream has started"
+        self._tiled_envs = list(envs)
+        self._tile_grid = grid
+        self._tile_downscale = downscale
+
     def _step(self, action):
         self._before_step(action)
         observation, reward, done, info = self.env.step(action)
@@ -66,9 +89,21 @@ class UniMonitor(Wrapper):
     def _before_step(self, action):
         return
 
+    def pace_with(self, pacer):
+        """Emits every frame of a step at the deadline of given `UniPacer`; frames that are already late are skipped"""
+        self._pacer = pacer
+
+    @property
+    def frames_per_sec(self):
+        return self.env.metadata.get('video.frames_per_second', 30)
+
     def _after_step(self, observation, reward, done, info):
         if not self.enabled: return done
 
+        # Waiting right before the capture makes the schedule cover computing the action and the step as well
+        if self._pacer is not None and not self._pacer.wait():
+            return done
+
         # Record video
         self.video_recorder.capture_frame()
 
@@ -150,6 +185,68 @@ class UniStreamRecorder(object):
             self._encode_image_frame(frame)
 
 
+class UniTiledStreamRecorder(UniStreamRecorder):
+    """
+    Streams frames of several environments as one mosaic video through a single encoder.
+
+    Latest `rgb_array` frame of every environment is downscaled by taking every `downscale`-th pixel and written
+    straight into its tile of a canvas allocated once, so there is no intermediate copy of any frame. Tiles are laid
+    out in `grid` (rows, columns), by default the smallest square-ish grid fitting all environments.
+    """
+
+    def __init__(self, envs, grid=None, downscale=1, enabled=True):
+        self.envs = list(envs)
+        self.downscale = downscale
+
+        if grid is None:
+            columns = int(np.ceil(np.sqrt(len(self.envs))))
+            grid = (int(np.ceil(len(self.envs) / columns)), columns)
+        self.grid = grid
+        if grid[0] * grid[1] < len(self.envs):
+            raise ValueError('Grid {} is too small for {} environments'.format(grid, len(self.envs)))
+
+        super(UniTiledStreamRecorder, self).__init__(self.envs[0], enabled=enabled)
+        logger.info('Streaming %d environments in %dx%d grid.', len(self.envs), *grid)
+
+        self.canvas = None
+        self._tiles = None
+
+    def _allocate_canvas(self, frame):
+        rows, columns = self.grid
+        h, w, pixfmt = frame[::self.downscale, ::self.downscale].shape
+        self.canvas = self.last_frame = np.zeros((rows * h, columns * w, pixfmt), dtype=np.uint8)
+        # View of the canvas indexed by tile: (row, column, y, x, channel)
+        self._tiles = self.canvas.reshape(rows, h, columns, w, pixfmt).swapaxes(1, 2)
+
+    def capture_frame(self):
+        """Render all environments and add the resulting mosaic to the video."""
+        if not self.functional: return
+
+        for number, env in enumerate(self.envs):
+            frame = env.render(mode='rgb_array')
+            if frame is None:
+                logger.warning(
+                    'Env returned None on render(). Disabling further rendering for stream recorder by marking as '
+                    'disabled')
+                self.broken = True
+                return
+
+            if self.canvas is None:
+                self._allocate_canvas(frame)
+
+            # Frames of other size than the first one are cropped or padded to the tile
+            tile = self._tiles[divmod(number, self.grid[1])]
+            step = self.downscale
+            frame = frame[:tile.shape[0] * step:step, :tile.shape[1] * step:step]
+            height, width = frame.shape[:2]
+            tile[:height, :width] = frame
+            if height < tile.shape[0] or width < tile.shape[1]:
+                tile[height:] = 0
+                tile[:height, width:] = 0
+
+        self._encode_image_frame(self.canvas)
+
+
 class UniImageEncoder(object):
     def __init__(self, frame_shape, frames_per_sec):
         self.proc = None
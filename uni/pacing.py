@@ -0,0 +1,60 @@
+import time
+
+
+class UniPacer:
+    """
+    Keeps video frames at the fixed rate of `frames_per_sec` using monotonic clock.
+
+    `wait` has to be called right before the frame is emitted, so lateness and jitter describe frame delivery and
+    not just the accuracy of sleeping. It sleeps until the deadline of the next frame; the last `spin_seconds` before
+    the deadline are busy-waited because `time.sleep` tends to oversleep. A frame which deadline has already passed
+    is reported as late, so the caller can skip emitting it. When the simulation falls behind by more than one frame,
+    the schedule is moved forward instead of running a burst of frames to catch up.
+    """
+
+    def __init__(self, frames_per_sec, spin_seconds=0.001):
+        assert frames_per_sec > 0, "frames_per_sec must be positive"
+        self.frames_per_sec = frames_per_sec
+        self.period = 1.0 / frames_per_sec
+        self.spin_seconds = spin_seconds
+        self._deadline = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.late_frames = 0
+        self.total_jitter = 0.0
+        self.max_jitter = 0.0
+
+    def wait(self):
+        """Waits for the next frame; returns False if the frame is late and should not be rendered"""
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now
+
+        self.frames += 1
+        delay = self._deadline - now
+
+        if delay < 0:
+            self.late_frames += 1
+            if -delay > self.period:
+                self._deadline = now
+            self._deadline += self.period
+            return False
+
+        if delay > self.spin_seconds:
+            time.sleep(delay - self.spin_seconds)
+        while time.monotonic() < self._deadline:
+            pass
+
+        jitter = time.monotonic() - self._deadline
+        self.total_jitter += jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+
+        self._deadline += self.period
+        return True
+
+    @property
+    def mean_jitter(self):
+        on_time_frames = self.frames - self.late_frames
+        return self.total_jitter / on_time_frames if on_time_frames else 0.0
@@ -0,0 +1,123 @@
+import logging
+import multiprocessing
+
+from uni import affinity
+
+logger = logging.getLogger(__name__)
+
+# Runner created inside of the pool worker process, see `worker_runner`
+_worker_runner = None
+
+
+def worker_runner():
+    """
+    Returns runner of current pool worker.
+
+    Task functions should use it to reach environment and algorithm objects, which are created only once per worker
+    and reused by all tasks that worker executes.
+    """
+    assert _worker_runner is not None, "worker_runner() can be called only inside of UniWorkerPool task"
+    return _worker_runner
+
+
+def _initialize_worker(runner_class, runner_kwargs, cpu_sets, counter, construct_algorithm, initializer, initargs):
+    global _worker_runner
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    if cpu_sets:
+        cpus = cpu_sets[index % len(cpu_sets)]
+        affinity.pin_process(cpus)
+        # Inherited limits are sized for all cores of the runner, not for this worker's share of them
+        affinity.limit_threads(len(cpus), override=True)
+    else:
+        cpus = None
+
+    _worker_runner = runner_class(**runner_kwargs)
+    _worker_runner.cpus = cpus
+    _worker_runner.worker_index = index
+
+    # Pay environment (and optionally algorithm) construction once, not per task
+    _worker_runner.environment
+    if construct_algorithm:
+        _worker_runner.algorithm
+
+    if initializer is not None:
+        initializer(*initargs)
+
+
+class UniWorkerPool:
+    """
+    Pool of pre-warmed worker processes.
+
+    Workers are forked from a forkserver that has already imported numpy, environment and algorithm modules (plus
+    any modules listed in `preload`), so starting a worker costs a fork instead of interpreter start and heavy imports.
+    Each worker creates its own runner and environment once and then executes many tasks. Tasks are module level
+    functions that reach that runner with `worker_runner()`.
+
+    When the parent runner has its CPU budget applied, cores are split between workers so they do not overlap.
+
+    Please note that forkserver is started once per process, therefore only the preload list of the first pool
+    takes effect.
+    """
+    WORKER_RUN_MODE = 'worker'
+
+    def __init__(self, runner, processes=None, preload=(), construct_algorithm=False, initializer=None, initargs=()):
+        if processes is None:
+            processes = len(runner.cpus) if runner.cpus else runner['CPU_NUMBER']
+        self.processes = processes
+
+        context = multiprocessing.get_context('forkserver')
+        modules = ['numpy', type(runner).__module__] + list(preload)
+        for path in (runner.environment_path, runner.algorithm_path):
+            if path is not None:
+                modules.append(path.rsplit('.', 1)[0])
+        context.set_forkserver_preload([module for module in modules if module != '__main__'])
+
+        runner_kwargs = {
+            'environment': runner.environment_path,
+            'algorithm': runner.algorithm_path,
+            # Workers never stream video nor talk to Uni API
+            'run_mode': self.WORKER_RUN_MODE,
+            'parameters': dict(runner.PARAMETERS_OVERRIDDEN),
+            'render': False,
+            'local': True,
+        }
+        cpu_sets = affinity.split_cpus(runner.cpus, processes) if runner.cpus else None
+
+        logger.info('Starting {processes} worker(s) on cores {cpu_sets}'.format(
+            processes=processes, cpu_sets=cpu_sets or 'inherited'))
+
+        self._pool = context.Pool(processes, initializer=_initialize_worker, initargs=(
+            type(runner), runner_kwargs, cpu_sets, context.Value('i', 0), construct_algorithm, initializer, initargs))
+
+    def apply(self, func, *args):
+        return self._pool.apply(func, args)
+
+    def apply_async(self, func, *args):
+        return self._pool.apply_async(func, args)
+
+    def map(self, func, iterable, chunksize=None):
+        return self._pool.map(func, iterable, chunksize)
+
+    def imap_unordered(self, func, iterable, chunksize=1):
+        return self._pool.imap_unordered(func, iterable, chunksize)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,198 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from uni.exceptions import UniFatalError
+
+
+class UniTrajectoryRecorder:
+    """
+    Streams rollouts into chunked, append-only columnar files.
+
+    Every column is kept in a separate `.npy` shard of at most `shard_size` steps, e.g.:
+
+        <directory>/index.json
+        <directory>/shard-00000.observations.npy
+        <directory>/shard-00000.actions.npy
+        ...
+
+    Steps are buffered in memory until a shard is full, then the shard is converted and written to disk on a
+    background thread so the training loop is never blocked on I/O. The index is rewritten after each shard, so if
+    the process gets killed everything up to the last finished shard is still readable with `UniTrajectoryReader`.
+
+    Please note that observations are kept by reference until the shard is flushed, so environments should not
+    mutate returned observations in place.
+    """
+    COLUMNS = ('observations', 'actions', 'rewards', 'dones', 'episodes')
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, directory, shard_size=10000, queue_size=4):
+        assert shard_size > 0, "shard_size must be positive"
+
+        self.directory = directory
+        self.shard_size = shard_size
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Recording to an existing directory appends new shards after the old ones
+        self._index = UniTrajectoryReader.read_index(self.directory) or {
+            'columns': list(self.COLUMNS), 'length': 0, 'shards': [], 'episode_starts': []}
+        self._length = self._index['length']
+
+        self._buffer = {column: [] for column in self.COLUMNS}
+        self._episode_starts = []
+        self._last_episode = None
+
+        self._error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._writer, name='UniTrajectoryRecorder', daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        """Number of recorded steps including those not flushed yet"""
+        return self._length
+
+    def record(self, episode, observation, action, reward, is_done):
+        """Append single environment step; `observation` is the one that `action` was taken upon"""
+        if self._error is not None:
+            raise UniFatalError('Trajectory recorder failed: %s' % self._error)
+
+        if episode != self._last_episode:
+            self._last_episode = episode
+            self._episode_starts.append(self._length)
+
+        self._buffer['observations'].append(observation)
+        self._buffer['actions'].append(action)
+        self._buffer['rewards'].append(reward)
+        self._buffer['dones'].append(is_done)
+        self._buffer['episodes'].append(episode)
+        self._length += 1
+
+        if len(self._buffer['episodes']) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """Hand over currently buffered steps to the writer thread as a new shard"""
+        if not self._buffer['episodes']:
+            return
+
+        self._queue.put((self._buffer, self._episode_starts))
+        self._buffer = {column: [] for column in self.COLUMNS}
+        self._episode_starts = []
+
+    def close(self):
+        """Flush remaining steps and wait for the writer thread to finish"""
+        if not self._thread.is_alive():
+            return
+
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None:
+            raise UniFatalError('Trajectory recorder failed: %s' % self._error)
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                # Keep draining the queue so that producer is never blocked
+                continue
+            try:
+                self._write_shard(*item)
+            except Exception as e:
+                self._error = e
+
+    def _write_shard(self, buffer, episode_starts):
+        prefix = 'shard-%05d' % len(self._index['shards'])
+        length = len(buffer['episodes'])
+
+        columns = {
+            'observations': np.asarray(buffer['observations']),
+            'actions': np.asarray(buffer['actions']),
+            'rewards': np.asarray(buffer['rewards'], dtype=np.float32),
+            'dones': np.asarray(buffer['dones'], dtype=np.bool_),
+            'episodes': np.asarray(buffer['episodes'], dtype=np.int64),
+        }
+
+        for column, array in columns.items():
+            self._atomic_write(os.path.join(self.directory, '%s.%s.npy' % (prefix, column)),
+                               lambda f, array=array: np.save(f, array, allow_pickle=False))
+
+        self._index['shards'].append({'prefix': prefix, 'length': length})
+        self._index['episode_starts'].extend(episode_starts)
+        self._index['length'] += length
+
+        self._atomic_write(os.path.join(self.directory, self.INDEX_FILE),
+                           lambda f: f.write(json.dumps(self._index).encode()))
+
+    @staticmethod
+    def _atomic_write(path, write):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            write(f)
+        os.replace(temp_path, path)
+
+
+class UniTrajectoryReader:
+    """
+    Reads trajectories written by `UniTrajectoryRecorder`.
+
+    Shards are opened as read-only memory maps, so only the pages that are actually touched are loaded.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = self.read_index(directory)
+        if self.index is None:
+            raise UniFatalError('There is no trajectory recording in %s' % directory)
+
+        self._offsets = np.cumsum([0] + [shard['length'] for shard in self.index['shards']])
+
+    @staticmethod
+    def read_index(directory):
+        index_file = os.path.join(directory, UniTrajectoryRecorder.INDEX_FILE)
+        if not os.path.isfile(index_file):
+            return None
+        with open(index_file) as f:
+            return json.load(f)
+
+    def __len__(self):
+        return self.index['length']
+
+    @property
+    def episode_starts(self):
+        """Global step numbers on which consecutive episodes have started"""
+        return self.index['episode_starts']
+
+    def shard(self, number, column):
+        """Returns memory mapped column of single shard"""
+        return np.load(os.path.join(self.directory, '%s.%s.npy' % (self.index['shards'][number]['prefix'], column)),
+                       mmap_mode='r')
+
+    def column(self, column):
+        """Returns list of memory mapped shards of given column"""
+        return [self.shard(number, column) for number in range(len(self.index['shards']))]
+
+    def slice(self, column, start, stop):
+        """Returns steps [start, stop) of given column, copying only shards that the range spans"""
+        first = max(int(np.searchsorted(self._offsets, start, side='right')) - 1, 0)
+        last = int(np.searchsorted(self._offsets, stop, side='left'))
+
+        parts = [self.shard(number, column)[max(start - self._offsets[number], 0):stop - self._offsets[number]]
+                 for number in range(first, min(last, len(self.index['shards'])))]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def episode(self, number):
+        """Returns all columns of n-th recorded episode (counting from 0)"""
+        starts = self.episode_starts
+        start = starts[number]
+        stop = starts[number + 1] if number + 1 < len(starts) else len(self)
+        return {column: self.slice(column, start, stop) for column in self.index['columns']}
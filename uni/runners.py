@@ -10,8 +10,16 @@ import datetime
 import numpy as np
 import requests
 
+from uni import affinity
+from uni.cache import UniActionCache
 from uni.exceptions import UniConfigurationError, UniFatalError
-from uni.helpers import import_path
+from uni.autotune import UniAutotuner
+from uni.helpers import import_path, int_list, parse_boolean, parse_grid, read_parameters_file, str_list, type_or_none
+from uni.pacing import UniPacer
+from uni.pool import UniWorkerPool
+from uni.recorders import UniTrajectoryRecorder
+from uni.stopping import UniEarlyStopping
+from uni.telemetry import UniMemoryMonitor
 
 
 class UniRunner:
@@ -30,16 +38,88 @@ class UniRunner:
     PARAMETERS = {
         'UNI_MODEL_DIR': '/tmp/uni-models/',
         'CPU_NUMBER': 1,
+        'CPU_SLOT': None,
+        'CPU_THREADS': None,
         'EPISODES': 100,
         'MODEL_SAVE_BEST_LAST_MEAN': 100,
         'MODEL_SAVE_FREQUENCY': 20,
+        'TRAJECTORY_DIR': None,
+        'TRAJECTORY_SHARD_SIZE': 10000,
+        'EARLY_STOP_PATIENCE': None,
+        'EARLY_STOP_MIN_DELTA': 0.0,
+        'EARLY_STOP_MIN_EPISODES': 0,
+        'TRAINING_TIME_BUDGET': None,
+        'TRAINING_STEPS_BUDGET': None,
+        'MEMORY_MONITOR_FREQUENCY': 0,
+        'MEMORY_MONITOR_FILE': '/tmp/uni-memory.jsonl',
+        'MEMORY_TRACEMALLOC_FREQUENCY': 0,
+        'MEMORY_TRACEMALLOC_TOP': 10,
+        'MEMORY_TRACK_TYPES': '',
+        'MEMORY_WARNING_MB': None,
+        'WORKER_PRELOAD': '',
+        'TRAIN_YIELD_EPISODES': 1,
+        'TRAIN_YIELD_SECONDS': None,
+        'ACTION_CACHE_SIZE': 4096,
+        'RUN_PACING': True,
+        'RUN_FRAMES_PER_SECOND': None,
+        'STREAM_TILES': 1,
+        'STREAM_GRID': None,
+        'STREAM_TILE_DOWNSCALE': 1,
+        'WORKERS_NUMBER': None,
+        'AUTOTUNE_ENVIRONMENTS': '1,2,4,8',
+        'AUTOTUNE_BATCH_SIZES': '1,2,4,8',
+        'AUTOTUNE_TRIAL_STEPS': 2000,
+        'AUTOTUNE_WARMUP_STEPS': 50,
+        'AUTOTUNE_OUTPUT': '/tmp/uni-autotune.json',
+        'ES_POPULATION': 50,
+        'ES_SIGMA': 0.02,
+        'ES_LEARNING_RATE': 0.01,
+        'ES_L2_COEFFICIENT': 0.005,
+        'ES_NOISE_SIZE': 10000000,
+        'ES_SEED': 123,
     }
     PARAMETERS_OVERRIDDEN = {}
     PARAMETERS_CLEANERS = {
         'EPISODES': int,
         'CPU_NUMBER': int,
+        'CPU_SLOT': affinity.cpu_slot,
+        'CPU_THREADS': type_or_none(int),
         'MODEL_SAVE_BEST_LAST_MEAN': int,
         'MODEL_SAVE_FREQUENCY': int,
+        'TRAJECTORY_DIR': type_or_none(str),
+        'TRAJECTORY_SHARD_SIZE': int,
+        'EARLY_STOP_PATIENCE': type_or_none(int),
+        'EARLY_STOP_MIN_DELTA': float,
+        'EARLY_STOP_MIN_EPISODES': int,
+        'TRAINING_TIME_BUDGET': type_or_none(float),
+        'TRAINING_STEPS_BUDGET': type_or_none(int),
+        'MEMORY_MONITOR_FREQUENCY': int,
+        'MEMORY_MONITOR_FILE': type_or_none(str),
+        'MEMORY_TRACEMALLOC_FREQUENCY': int,
+        'MEMORY_TRACEMALLOC_TOP': int,
+        'MEMORY_TRACK_TYPES': str_list,
+        'MEMORY_WARNING_MB': type_or_none(float),
+        'WORKER_PRELOAD': str_list,
+        'TRAIN_YIELD_EPISODES': int,
+        'TRAIN_YIELD_SECONDS': type_or_none(float),
+        'ACTION_CACHE_SIZE': int,
+        'RUN_PACING': parse_boolean,
+        'RUN_FRAMES_PER_SECOND': type_or_none(float),
+        'STREAM_TILES': int,
+        'STREAM_GRID': parse_grid,
+        'STREAM_TILE_DOWNSCALE': int,
+        'WORKERS_NUMBER': type_or_none(int),
+        'AUTOTUNE_ENVIRONMENTS': int_list,
+        'AUTOTUNE_BATCH_SIZES': int_list,
+        'AUTOTUNE_TRIAL_STEPS': int,
+        'AUTOTUNE_WARMUP_STEPS': int,
+        'AUTOTUNE_OUTPUT': str,
+        'ES_POPULATION': int,
+        'ES_SIGMA': float,
+        'ES_LEARNING_RATE': float,
+        'ES_L2_COEFFICIENT': float,
+        'ES_NOISE_SIZE': int,
+        'ES_SEED': int,
     }
 
     # Prepare runner object from shell arguments
@@ -49,7 +129,7 @@ class UniRunner:
 
         parser = argparse.ArgumentParser(description='%s' % cls.__name__)
 
-        parser.add_argument('-m', '--mode', default='train', choices=['train', 'run'],
+        parser.add_argument('-m', '--mode', default='train', choices=['train', 'run', 'autotune'],
                             help='running mode; default=train')
 
         parser.add_argument('-e', '--environment', metavar=cls.ENVIRONMENT_VAR_NAME,
@@ -64,6 +144,9 @@ class UniRunner:
                             action='append', required=False,
                             help='set specific parameter name')
 
+        parser.add_argument('-p', '--parameters-file', default=None,
+                            help='JSON file with parameters, e.g. written by autotune mode; --set takes precedence')
+
         parser.add_argument('-l', '--local', default=False, action='store_true',
                             help='enable local run mode')
 
@@ -86,7 +169,8 @@ class UniRunner:
         args = parser.parse_args()
 
         return cls(environment=args.environment, algorithm=args.algorithm, run_mode=args.mode,
-                   parameters=dict(args.set), render=args.render, local=args.local)
+                   parameters=dict(args.set), render=args.render, local=args.local,
+                   parameters_file=args.parameters_file)
 
     # Set up propper logging rules
 
@@ -137,9 +221,13 @@ class UniRunner:
 
     # Runner object
 
-    def __init__(self, environment=None, algorithm=None, run_mode='train', parameters=None, render=False, local=False):
+    def __init__(self, environment=None, algorithm=None, run_mode='train', parameters=None, render=False, local=False,
+                 parameters_file=None):
         assert parameters is None or type(parameters) is dict, "parameters must be dict or None"
 
+        if parameters_file is not None:
+            self.PARAMETERS_OVERRIDDEN.update(read_parameters_file(parameters_file))
+
         if parameters is not None:
             self.PARAMETERS_OVERRIDDEN.update(parameters)
 
@@ -158,6 +246,11 @@ class UniRunner:
         self._last_update_episode_time = None
         self._last_update_episode = None
 
+        self._trajectory_recorder = None
+
+        self.cpus = None  # cores assigned to this runner, see `apply_cpu_budget`
+        self.worker_index = None  # set only for runners living inside of UniWorkerPool workers
+
         self.render = render
         self.local = local
 
@@ -179,8 +272,7 @@ class UniRunner:
         value = None
 
         # Scan sources of parameters in specific order, break at first one found
-        for parameter_source in (self.PARAMETERS_OVERRIDDEN, os.environ, self.PARAMETERS, self.algorithm.PARAMETERS,
-                                 self.environment.PARAMETERS):
+        for parameter_source in self._parameter_sources():
             if name in parameter_source:
                 value = parameter_source[name]
                 break
@@ -190,8 +282,7 @@ class UniRunner:
             # Please note that we are NOT checking if value is None; None is acceptable parameter value
             raise UniConfigurationError('Parameter {name} is missing. Please define it.'.format(name=name))
 
-        for cleaner_source in (self.PARAMETERS_CLEANERS, self.algorithm.PARAMETERS_CLEANERS,
-                               self.environment.PARAMETERS_CLEANERS):
+        for cleaner_source in self._cleaner_sources():
             if name in cleaner_source:
                 try:
                     value = cleaner_source[name](value)
@@ -203,6 +294,20 @@ class UniRunner:
 
         return value
 
+    def _parameter_sources(self):
+        # Sources are resolved lazily, so runner's own parameters can be read before algorithm and environment
+        # modules are imported
+        yield self.PARAMETERS_OVERRIDDEN
+        yield os.environ
+        yield self.PARAMETERS
+        yield self.algorithm.PARAMETERS
+        yield self.environment.PARAMETERS
+
+    def _cleaner_sources(self):
+        yield self.PARAMETERS_CLEANERS
+        yield self.algorithm.PARAMETERS_CLEANERS
+        yield self.environment.PARAMETERS_CLEANERS
+
     @property
     def environment(self):
         """
@@ -243,6 +348,37 @@ class UniRunner:
                                         action_space=self.environment.action_space)
         return self._algorithm
 
+    @property
+    def trajectory_recorder(self):
+        """
+        Gets trajectory recorder or None if recording is disabled.
+
+        Recording is enabled by setting TRAJECTORY_DIR parameter; rollouts are written to a subdirectory named after
+        the run mode.
+        """
+        if self._trajectory_recorder is None and self['TRAJECTORY_DIR'] is not None:
+            directory = os.path.join(self['TRAJECTORY_DIR'], self.run_mode)
+            self.logger.info('Recording trajectories to {dir}'.format(dir=directory))
+            self._trajectory_recorder = UniTrajectoryRecorder(directory, shard_size=self['TRAJECTORY_SHARD_SIZE'])
+        return self._trajectory_recorder
+
+    def close_trajectory_recorder(self):
+        """
+        Writes down all buffered trajectory steps.
+
+        It is called from `finally` blocks, so when another exception is already propagating a recorder failure
+        is only logged to not hide the original error.
+        """
+        if self._trajectory_recorder is not None:
+            recorder, self._trajectory_recorder = self._trajectory_recorder, None
+            propagating = sys.exc_info()[1]
+            try:
+                recorder.close()
+            except UniFatalError as e:
+                if propagating is None:
+                    raise
+                self.logger.error(e.message)
+
     @property
     def name(self):
         """
@@ -255,6 +391,8 @@ class UniRunner:
         Runs whole machinery with regards to the mode that runner was created in.
         """
         try:
+            self.apply_cpu_budget()
+
             if self.run_mode == 'run':
                 self.run_model()
             elif self.run_mode == 'train':
@@ -287,6 +425,8 @@ class UniRunner:
                             data={'failed': False}
                         )
 
+            elif self.run_mode == 'autotune':
+                self.run_autotune()
             elif self.run_mode == 'info':
                 self.run_info()
             else:
@@ -300,6 +440,59 @@ class UniRunner:
             self.logger.error("Bad configuration! {problem}".format(problem=e.message))
             sys.exit(2)
 
+    def apply_cpu_budget(self):
+        """
+        Pins runner process to CPU_NUMBER cores and limits native thread pools accordingly.
+
+        Pinning is opt-in: cores are taken from the slot given by CPU_SLOT parameter, so several runs packed on one
+        node (each with different slot) do not compete for the same cores. CPU_SLOT=auto picks the first slot not
+        taken by other runners on the node. Processes spawned later inherit the affinity; worker pools further split
+        `self.cpus` between workers. It must be called before algorithm and environment are loaded.
+        """
+        slot = self['CPU_SLOT']
+        if slot is None:
+            self.logger.info('CPU layout: not pinned, set CPU_SLOT to apply CPU_NUMBER budget')
+            return
+
+        if slot == 'auto':
+            slot = affinity.acquire_cpu_slot(self['CPU_NUMBER'])
+        self.cpus = affinity.select_cpus(self['CPU_NUMBER'], slot)
+        threads = self['CPU_THREADS'] or len(self.cpus)
+
+        pinned = affinity.pin_process(self.cpus)
+        affinity.limit_threads(threads)
+
+        self.logger.info('CPU layout: slot {slot}, cores {cpus}{pinned}, {threads} thread(s) per native pool'.format(
+            slot=slot, cpus=self.cpus, pinned='' if pinned else ' (affinity not supported)', threads=threads))
+
+    def create_worker_pool(self, processes=None, **kwargs):
+        """
+        Creates pool of pre-warmed workers sharing CPU budget of this runner.
+
+        Number of workers defaults to WORKERS_NUMBER parameter. Additional modules to import once in the forkserver
+        can be listed in WORKER_PRELOAD parameter.
+        """
+        if processes is None:
+            processes = self['WORKERS_NUMBER']
+        return UniWorkerPool(self, processes=processes, preload=self['WORKER_PRELOAD'], **kwargs)
+
+    def run_autotune(self):
+        """
+        Measures throughput of environment and algorithm for different parallelism settings and writes the best one
+        to AUTOTUNE_OUTPUT parameters file
+        """
+        self.logger.info("Running autotune...")
+
+        autotuner = UniAutotuner(self)
+        autotuner.run()
+        if autotuner.best is None:
+            raise UniConfigurationError('No autotune setting to measure; check AUTOTUNE_ENVIRONMENTS and '
+                                        'AUTOTUNE_BATCH_SIZES')
+
+        parameters = autotuner.write(self['AUTOTUNE_OUTPUT'])
+        self.logger.info("Best setting {parameters} ({steps_per_sec:.1f} steps/s) written to {path}".format(
+            parameters=parameters, steps_per_sec=autotuner.best['steps_per_sec'], path=self['AUTOTUNE_OUTPUT']))
+
     def run_info(self):
         """Prints custom string to be shown in visualisation window"""
         print(self.name)
@@ -312,17 +505,37 @@ class UniRunner:
 
         self.logger.info("Running training...")
 
-        for episodes_rewards in self.algorithm.train():
-            model_score = self.get_model_score(episodes_rewards)
-            episode = len(episodes_rewards)
+        stopping = self.get_stopping_policy()
+        memory_monitor = self.get_memory_monitor()
+        training = self.algorithm.train()
+        episode = 0
 
-            if len(episodes_rewards) % 1000 == 0:
-                print('@metric score %d %f' % (len(episodes_rewards), model_score))
+        try:
+            for episodes_rewards in training:
+                model_score = self.get_model_score(episodes_rewards)
+                # Algorithm may yield after a batch of episodes, so check if we crossed a multiple of 1000
+                previous_episode, episode = episode, len(episodes_rewards)
+
+                if episode // 1000 > previous_episode // 1000:
+                    print('@metric score %d %f' % (len(episodes_rewards), model_score))
+
+                if self.should_save_model(model_score, episode):
+                    self.model_save(model_score, episode)
 
-            if self.should_save_model(model_score, episode):
-                self.model_save(model_score, episode)
+                self.update_episode_count(len(episodes_rewards))
 
-            self.update_episode_count(len(episodes_rewards))
+                if memory_monitor is not None:
+                    memory_monitor.maybe_sample(episode)
+
+                stop_reason = stopping.update(model_score, episode, self.algorithm.total_steps)
+                if stop_reason is not None:
+                    self.logger.info("Stopping training early: {reason}".format(reason=stop_reason))
+                    break
+        finally:
+            training.close()
+            self.close_trajectory_recorder()
+            if memory_monitor is not None:
+                memory_monitor.close()
 
         self.update_episode_count(len(episodes_rewards), force=True)
         self.model_save(model_score, episode)
@@ -337,27 +550,115 @@ class UniRunner:
 
         self.algorithm.load(directory=self.parameter('UNI_MODEL_DIR'))
 
+        recorder = self.trajectory_recorder
+        action_cache = self.get_action_cache()
+        pacer = self.get_pacer()
+        # Streamed frames are paced by the environment itself right before they are captured
+        step_pacer = pacer if pacer is not None and (self.render or not self.environment.pace_frames(pacer)) else None
+        tiles = self.get_tile_environments()
+        tiles_observations = [tile.reset() for tile in tiles]
         episode = 0
 
-        while True:  # Episode loop
-            episode += 1
-            step = 0
-            is_done = False
-            observation = self.environment.reset()
-            episode_reward = 0
+        try:
+            while True:  # Episode loop
+                episode += 1
+                step = 0
+                is_done = False
+                observation = self.environment.reset()
+                episode_reward = 0
+
+                while not is_done:  # Step loop
+                    step += 1
+
+                    # Rendered frame is paced right before it is drawn; frames that are already late are not drawn at all
+                    on_time = step_pacer is None or step_pacer.wait()
+                    if self.render and on_time:
+                        self.environment.render()
+
+                    if action_cache is not None:
+                        action = action_cache.action(self.algorithm, episode, step, observation)
+                    else:
+                        action = self.algorithm.action(episode, step, observation)
+
+                    # Tiles run their own episodes; they are stepped before the main environment captures the frame
+                    for number, tile in enumerate(tiles):
+                        tile_observation, _, tile_done, _ = tile.step(self.algorithm.action(
+                            episode, step, tiles_observations[number]))
+                        tiles_observations[number] = tile.reset() if tile_done else tile_observation
+
+                    new_observation, reward, is_done, debug = self.environment.step(action)
+                    if recorder is not None:
+                        recorder.record(episode, observation, action, reward, is_done)
+                    observation = new_observation
+                    episode_reward += reward
+
+                self.logger.info("Episode #{episode} reward {reward}".format(episode=episode, reward=episode_reward))
+                if pacer is not None:
+                    self.logger.info(
+                        "Pacing {fps}fps: late frames {late}/{frames}, jitter mean={mean:.2f}ms max={max:.2f}ms".format(
+                            fps=pacer.frames_per_sec, late=pacer.late_frames, frames=pacer.frames,
+                            mean=pacer.mean_jitter * 1000, max=pacer.max_jitter * 1000))
+                    pacer.reset_stats()
+                if action_cache is not None:
+                    self.logger.info("Action cache hits={hits} misses={misses} ratio={ratio:.3f}".format(
+                        hits=action_cache.hits, misses=action_cache.misses, ratio=action_cache.hit_ratio))
+        finally:
+            self.close_trajectory_recorder()
+
+    def get_tile_environments(self):
+        """
+        Creates additional environment instances streamed as tiles of the main environment video in run mode.
+
+        STREAM_TILES sets the total number of tiles, STREAM_GRID their layout (e.g. `2x3`) and STREAM_TILE_DOWNSCALE
+        the factor by which frames are downscaled. No tiles are used when the environment cannot stream them, e.g.
+        with `--render`.
+        """
+        if self['STREAM_TILES'] <= 1:
+            return []
 
-            while not is_done:  # Step loop
-                step += 1
+        tiles = [import_path(self.environment_path)(runner=self) for _ in range(self['STREAM_TILES'] - 1)]
+        if not self.environment.stream_tiles(tiles, grid=self['STREAM_GRID'], downscale=self['STREAM_TILE_DOWNSCALE']):
+            self.logger.warning('{name} cannot stream tiles, STREAM_TILES is ignored'.format(
+                name=self.environment.__class__.__name__))
+            return []
 
-                if self.render:
-                    self.environment.render()
+        self.logger.info('Streaming {number} environments as tiles'.format(number=len(tiles) + 1))
+        return tiles
 
-                action = self.algorithm.action(episode, step, observation)
+    def get_action_cache(self):
+        """Creates action cache for run mode if algorithm is deterministic and ACTION_CACHE_SIZE is not 0"""
+        if not self.algorithm.DETERMINISTIC or not self['ACTION_CACHE_SIZE']:
+            return None
+        return UniActionCache(self['ACTION_CACHE_SIZE'])
 
-                observation, reward, is_done, debug = self.environment.step(action)
-                episode_reward += reward
+    def get_pacer(self):
+        """
+        Creates scheduler keeping run mode at the frame rate of the video stream.
 
-            self.logger.info("Episode #{episode} reward {reward}".format(episode=episode, reward=episode_reward))
+        Frame rate is taken from RUN_FRAMES_PER_SECOND or environment; pacing can be disabled with RUN_PACING.
+        """
+        if not self['RUN_PACING']:
+            return None
+        frames_per_second = self['RUN_FRAMES_PER_SECOND'] or self.environment.frames_per_second
+        if not frames_per_second:
+            return None
+        return UniPacer(frames_per_second)
+
+    def get_stopping_policy(self):
+        """Creates policy that decides if training can be finished before running all EPISODES"""
+        return UniEarlyStopping(patience=self['EARLY_STOP_PATIENCE'], min_delta=self['EARLY_STOP_MIN_DELTA'],
+                                min_episodes=self['EARLY_STOP_MIN_EPISODES'],
+                                time_budget=self['TRAINING_TIME_BUDGET'], steps_budget=self['TRAINING_STEPS_BUDGET'])
+
+    def get_memory_monitor(self):
+        """Creates memory telemetry for training or returns None if MEMORY_MONITOR_FREQUENCY is not set"""
+        if not self['MEMORY_MONITOR_FREQUENCY']:
+            return None
+        return UniMemoryMonitor(self.logger, frequency=self['MEMORY_MONITOR_FREQUENCY'],
+                                output_file=self['MEMORY_MONITOR_FILE'],
+                                tracemalloc_frequency=self['MEMORY_TRACEMALLOC_FREQUENCY'],
+                                tracemalloc_top=self['MEMORY_TRACEMALLOC_TOP'],
+                                track_types=self['MEMORY_TRACK_TYPES'], warning_mb=self['MEMORY_WARNING_MB'])
 
     def get_model_score(self, episodes_rewards):
         """Dummy scoring; last N-th mean reward"""
@@ -0,0 +1,47 @@
+import time
+
+
+class UniEarlyStopping:
+    """
+    Stopping policy evaluated on the stream of model scores calculated by runner during training.
+
+    Training is stopped when any of the following happens:
+    - score has not improved by more than `min_delta` for `patience` episodes,
+    - training lasts longer than `time_budget` seconds,
+    - algorithm performed more than `steps_budget` environment steps in total.
+
+    Plateau is not checked before `min_episodes` episodes had been run; budgets are always enforced. Every condition
+    can be disabled with None.
+    """
+
+    def __init__(self, patience=None, min_delta=0.0, min_episodes=0, time_budget=None, steps_budget=None):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.min_episodes = min_episodes
+        self.time_budget = time_budget
+        self.steps_budget = steps_budget
+
+        self.best_score = None
+        self.best_episode = 0
+        self._start_time = time.monotonic()
+
+    def update(self, model_score, episode, steps=None):
+        """Feeds next score to the policy; returns reason of stopping or None if training should continue"""
+        if self.best_score is None or model_score > self.best_score + self.min_delta:
+            self.best_score = model_score
+            self.best_episode = episode
+
+        if self.time_budget is not None and time.monotonic() - self._start_time >= self.time_budget:
+            return 'time budget of {budget}s exceeded'.format(budget=self.time_budget)
+
+        if self.steps_budget is not None and steps is not None and steps >= self.steps_budget:
+            return 'steps budget of {budget} exceeded'.format(budget=self.steps_budget)
+
+        if episode < self.min_episodes:
+            return None
+
+        if self.patience is not None and episode - self.best_episode >= self.patience:
+            return 'score {score} has not improved for {patience} episodes'.format(
+                score=self.best_score, patience=episode - self.best_episode)
+
+        return None
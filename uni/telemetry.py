@@ -0,0 +1,159 @@
+import datetime
+import gc
+import json
+import os
+import resource
+import sys
+import tracemalloc
+
+MB = 1024 * 1024
+
+# Locations of the memory limit for cgroups v2 and v1 respectively
+CGROUP_MEMORY_LIMIT_FILES = (
+    '/sys/fs/cgroup/memory.max',
+    '/sys/fs/cgroup/memory/memory.limit_in_bytes',
+)
+
+
+def current_rss():
+    """Returns resident set size of current process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        # No procfs, fall back to the peak value which is the best approximation we have
+        return peak_rss()
+
+
+def peak_rss():
+    """Returns peak resident set size of current process in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def memory_limit():
+    """Returns cgroup memory limit in bytes or None if process is not limited"""
+    for limit_file in CGROUP_MEMORY_LIMIT_FILES:
+        try:
+            with open(limit_file) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 2 ** 60:  # cgroups v1 uses huge number for "no limit"
+            return int(value)
+    return None
+
+
+class UniMemoryMonitor:
+    """
+    Opt-in memory telemetry for long training runs.
+
+    Every `frequency` episodes it records RSS and peak RSS, counts live objects of `track_types` (type names,
+    optionally with module, e.g. `deque` or `collections.deque`) and every `tracemalloc_frequency` samples compares
+    `tracemalloc` snapshots to find allocation sites that grew the most. Samples are logged and appended to
+    `output_file` as JSON lines. Please note that only objects tracked by garbage collector can be counted, which
+    excludes e.g. numpy arrays; tracemalloc statistics cover those.
+
+    A warning is logged whenever RSS crosses `warning_mb`, which by default is 90% of the cgroup memory limit,
+    so a run that is about to be OOM-killed leaves a trace in the logs.
+    """
+    WARNING_LIMIT_FRACTION = 0.9
+
+    def __init__(self, logger, frequency, output_file=None, tracemalloc_frequency=0, tracemalloc_top=10,
+                 track_types=(), warning_mb=None):
+        self.logger = logger
+        self.frequency = frequency
+        self.output_file = output_file
+        self.tracemalloc_frequency = tracemalloc_frequency
+        self.tracemalloc_top = tracemalloc_top
+        self.track_types = set(track_types)
+
+        if warning_mb is None and memory_limit() is not None:
+            warning_mb = memory_limit() * self.WARNING_LIMIT_FRACTION / MB
+        self.warning_mb = warning_mb
+
+        self._samples = 0
+        self._last_episode = 0
+        self._snapshot = None
+
+        self._started_tracemalloc = bool(self.tracemalloc_frequency) and not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+
+        if self.output_file is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_file)), exist_ok=True)
+
+    def maybe_sample(self, episode):
+        """Takes sample if at least `frequency` episodes passed since the previous one"""
+        if episode - self._last_episode >= self.frequency:
+            return self.sample(episode)
+        return None
+
+    def sample(self, episode):
+        self._last_episode = episode
+        self._samples += 1
+
+        sample = {
+            'time': datetime.datetime.now().isoformat(),
+            'episode': episode,
+            'rss_mb': round(current_rss() / MB, 1),
+            'peak_rss_mb': round(peak_rss() / MB, 1),
+        }
+
+        if self.track_types:
+            sample['objects'] = self.count_objects()
+
+        if self.tracemalloc_frequency and self._samples % self.tracemalloc_frequency == 0:
+            sample['top_growth'] = self.top_growth()
+
+        self.logger.info('Memory at episode #{episode}: rss={rss}MB peak={peak}MB{objects}'.format(
+            episode=episode, rss=sample['rss_mb'], peak=sample['peak_rss_mb'],
+            objects=' objects=%s' % sample['objects'] if 'objects' in sample else ''))
+        for growth in sample.get('top_growth', []):
+            self.logger.info('Memory growth {size_diff_kb:+.1f}KB ({count_diff:+d} blocks) at {location}'.format(
+                **growth))
+
+        if self.warning_mb is not None and sample['rss_mb'] >= self.warning_mb:
+            self.logger.warning('Memory usage {rss}MB exceeded warning threshold of {threshold:.0f}MB'.format(
+                rss=sample['rss_mb'], threshold=self.warning_mb))
+
+        if self.output_file is not None:
+            with open(self.output_file, 'a') as f:
+                f.write(json.dumps(sample) + '\n')
+
+        return sample
+
+    def count_objects(self):
+        """Counts live objects tracked by garbage collector whose type matches `track_types`"""
+        counts = dict.fromkeys(self.track_types, 0)
+        for obj in gc.get_objects():
+            klass = type(obj)
+            for name in (klass.__name__, '%s.%s' % (klass.__module__, klass.__qualname__)):
+                if name in counts:
+                    counts[name] += 1
+        return counts
+
+    def top_growth(self):
+        """Returns allocation sites that grew the most since previous snapshot"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return []
+
+        # Statistics are sorted by absolute change, so shrinking sites have to be dropped before taking the top
+        growing = [stat for stat in snapshot.compare_to(previous, 'lineno') if stat.size_diff > 0]
+        return [{
+            'location': str(stat.traceback),
+            'size_diff_kb': round(stat.size_diff / 1024, 1),
+            'count_diff': stat.count_diff,
+        } for stat in growing[:self.tracemalloc_top]]
+
+    def close(self):
+        # Tracing started by someone else is left running
+        if self._started_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracemalloc = False
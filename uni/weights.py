@@ -0,0 +1,123 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from uni.exceptions import UniFatalError
+
+
+class UniWeightStore:
+    """
+    Stores named numpy arrays in a single uncompressed file which can be memory mapped on load.
+
+    File layout:
+
+        magic (8 bytes) | header length (uint64, little endian) | JSON header | padding | aligned arrays
+
+    Header maps array names to dtype, shape and offset in the file; every array starts at offset aligned to
+    `ALIGNMENT` bytes. Memory mapped arrays are read-only views of the page cache, so many processes loading the
+    same model share the memory and loading does not depend on model size.
+
+    Saving writes to a temporary file in the same directory and renames it, so readers never see partial file.
+    """
+    MAGIC = b'UNIWGT01'
+    ALIGNMENT = 64
+    EXTENSION = '.uniw'
+
+    def __init__(self, directory, name='weights'):
+        self.directory = directory
+        self.name = name
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.name + self.EXTENSION)
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def _align(self, offset):
+        return -(-offset // self.ALIGNMENT) * self.ALIGNMENT
+
+    def save(self, arrays):
+        """Atomically writes dict of name -> array"""
+        arrays = {name: np.asarray(array, order='C') for name, array in arrays.items()}
+        for name, array in arrays.items():
+            if array.dtype.hasobject:
+                raise ValueError('Array {name} has object dtype which cannot be stored'.format(name=name))
+
+        # Header size depends on offsets and offsets depend on header size, so reserve space for the header
+        # with the longest possible offsets and lay out the arrays after it
+        header = {name: {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': 2 ** 63}
+                  for name, array in arrays.items()}
+        data_offset = self._align(len(self.MAGIC) + 8 + len(json.dumps(header).encode()))
+
+        offset = data_offset
+        for name, array in arrays.items():
+            header[name]['offset'] = offset
+            offset = self._align(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode().ljust(data_offset - len(self.MAGIC) - 8)
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = '{path}.tmp-{pid}'.format(path=self.path, pid=os.getpid())
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(self.MAGIC)
+                f.write(struct.pack('<Q', len(header_bytes)))
+                f.write(header_bytes)
+                for name, array in arrays.items():
+                    f.seek(header[name]['offset'])
+                    f.write(array.data)
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        # Make rename itself durable
+        if hasattr(os, 'O_DIRECTORY'):
+            directory_fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+
+    def read_header(self, f):
+        if f.read(len(self.MAGIC)) != self.MAGIC:
+            raise UniFatalError('File {path} is not a weight store'.format(path=self.path))
+        header_length, = struct.unpack('<Q', f.read(8))
+        try:
+            return json.loads(f.read(header_length).decode())
+        except ValueError as e:
+            raise UniFatalError('Cannot parse weight store header ({path}): {error}'.format(path=self.path, error=e))
+
+    def load(self, mmap=True):
+        """
+        Returns dict of name -> array.
+
+        With `mmap` arrays are read-only memory mapped views; copy them if the model needs to modify its weights.
+        """
+        with open(self.path, 'rb') as f:
+            header = self.read_header(f)
+
+            if not mmap:
+                arrays = {}
+                for name, spec in header.items():
+                    f.seek(spec['offset'])
+                    dtype = np.dtype(spec['dtype'])
+                    count = int(np.prod(spec['shape'], dtype=np.int64))
+                    arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(spec['shape'])
+                return arrays
+
+            # Mapping the already open file keeps header and data from the same file even if `save` replaces it
+            buffer = np.memmap(f, dtype=np.uint8, mode='r')
+
+        arrays = {}
+        for name, spec in header.items():
+            dtype = np.dtype(spec['dtype'])
+            nbytes = int(np.prod(spec['shape'], dtype=np.int64)) * dtype.itemsize
+            arrays[name] = buffer[spec['offset']:spec['offset'] + nbytes].view(dtype).reshape(spec['shape'])
+        return arrays